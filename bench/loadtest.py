@@ -0,0 +1,299 @@
+# bench/loadtest.py – lasttest av API:t mot lokala stand-ins för källsidorna
+# - startar lokala HTTP-servrar som serverar sparade sidor (bench/fixtures/)
+#   med valbar latens och felfrekvens; de skickar ETag och svarar 304 på
+#   If-None-Match (av med --no-etag), men scrapers skickar inga villkorade anrop
+#   i dag – statusfördelningen visas i rapporten
+# - startar appen som egen process (`uvicorn main:app`, som i produktion) med
+#   STRYKET_ORIGIN / FOOTY_ORIGIN pekade mot stand-ins (se upstream.py)
+# - kör samtidiga klienter mot appen och skriver en rapport (req/s, p50/p90/p99)
+# - footy saknar endpoint i appen – det scenariot mäter bara scrapern och redovisas separat
+#
+# Användning (från repo-roten):
+#   python bench/loadtest.py --clients 8 --duration 20 --latency-ms 150 --error-rate 0.02
+#   python bench/loadtest.py --out runs/render_starter.json
+#   python bench/loadtest.py --compare runs/render_starter.json
+#   python bench/loadtest.py --no-etag --compare runs/render_starter.json
+
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+import argparse
+import hashlib
+import json
+import os
+import pathlib
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+FIXTURES = pathlib.Path(__file__).resolve().parent / "fixtures"
+
+STRYKET_URL = "https://www.stryketanalysen.se/stryktipset/"
+FOOTY_URL = "https://footystats.org/england/arsenal-fc-vs-chelsea-fc-h2h-stats"
+
+# ---------------------------------
+# Stand-in för källsidorna
+# ---------------------------------
+class _StandIn(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, body: bytes, latency_ms: float, error_rate: float, etag: bool = True):
+        super().__init__(("127.0.0.1", 0), _StandInHandler)
+        self.body = body
+        self.etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"' if etag else None
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.hits = 0
+        self.statuses: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def origin(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    server: _StandIn
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        srv = self.server
+        with srv._lock:
+            srv.hits += 1
+        if srv.latency_ms:
+            # lite jitter så att fördelningen liknar ett riktigt nät
+            time.sleep(random.uniform(0.5, 1.5) * srv.latency_ms / 1000)
+        if srv.error_rate and random.random() < srv.error_rate:
+            self._send(503, b"Service Unavailable", "text/plain")
+            return
+        if srv.etag and self.headers.get("If-None-Match") == srv.etag:
+            self._send(304, b"", None)
+            return
+        self._send(200, srv.body, "text/html; charset=utf-8")
+
+    def _send(self, status: int, body: bytes, ctype: Optional[str]) -> None:
+        with self.server._lock:
+            self.server.statuses[str(status)] = self.server.statuses.get(str(status), 0) + 1
+        self.send_response(status)
+        if self.server.etag:
+            self.send_header("ETag", self.server.etag)
+        if ctype:
+            self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+def _start_stand_in(fixture: str, latency_ms: float, error_rate: float, etag: bool) -> _StandIn:
+    srv = _StandIn((FIXTURES / fixture).read_bytes(), latency_ms, error_rate, etag)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+# ---------------------------------
+# Appen under test
+# ---------------------------------
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _start_app(port: int, env: Dict[str, str]) -> subprocess.Popen:
+    # egen process: lastgeneratorns trådar delar då inte GIL med appen
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=str(ROOT), env={**os.environ, **env},
+    )
+    deadline = time.time() + 30
+    while True:
+        if proc.poll() is not None:
+            sys.exit(f"Appen avslutades vid start (exit {proc.returncode}).")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/health", timeout=1).ok:
+                return proc
+        except requests.RequestException:
+            pass
+        if time.time() > deadline:
+            proc.terminate()
+            sys.exit("Appen startade inte inom 30 s.")
+        time.sleep(0.1)
+
+# ---------------------------------
+# Lastgenerator
+# ---------------------------------
+def _percentile(sorted_vals: List[float], p: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    k = min(len(sorted_vals) - 1, max(0, int(round(p / 100 * (len(sorted_vals) - 1)))))
+    return sorted_vals[k]
+
+def _drive(name: str, call: Callable[[requests.Session], bool], clients: int, duration: float) -> Dict[str, Any]:
+    """Kör `call` i `clients` trådar under `duration` sekunder. call returnerar True vid lyckat svar."""
+    lat: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def worker() -> None:
+        nonlocal errors
+        with requests.Session() as sess:
+            while time.perf_counter() < stop_at:
+                t0 = time.perf_counter()
+                try:
+                    ok = call(sess)
+                except Exception:
+                    ok = False
+                dt = time.perf_counter() - t0
+                with lock:
+                    lat.append(dt)
+                    if not ok:
+                        errors += 1
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as ex:
+        for _ in range(clients):
+            ex.submit(worker)
+    elapsed = time.perf_counter() - t0
+
+    lat.sort()
+    ms = [x * 1000 for x in lat]
+    return {
+        "scenario": name,
+        "clients": clients,
+        "requests": len(lat),
+        "errors": errors,
+        "rps": len(lat) / elapsed if elapsed else 0.0,
+        "p50_ms": _percentile(ms, 50),
+        "p90_ms": _percentile(ms, 90),
+        "p99_ms": _percentile(ms, 99),
+        "max_ms": ms[-1] if ms else 0.0,
+    }
+
+def _app_scenarios(base: str) -> Dict[str, Callable[[requests.Session], bool]]:
+    def svenskaspel(sess: requests.Session) -> bool:
+        r = sess.post(f"{base}/svenskaspel", json={"url": STRYKET_URL}, timeout=60)
+        return r.status_code == 200
+
+    def excel(sess: requests.Session) -> bool:
+        r = sess.get(f"{base}/excel", timeout=60)
+        return r.status_code == 200 and len(r.content) > 0
+
+    return {"svenskaspel": svenskaspel, "excel": excel}
+
+def _scraper_scenarios() -> Dict[str, Callable[[requests.Session], bool]]:
+    # appen har ingen /footy-endpoint – scrapern körs i lastgeneratorn (inte appens kapacitet)
+    import scrape_footy
+
+    def footy(sess: requests.Session) -> bool:
+        return bool(scrape_footy.fetch_footy(FOOTY_URL).get("home_name"))
+
+    return {"footy": footy}
+
+# ---------------------------------
+# Rapport
+# ---------------------------------
+def _print_report(title: str, results: List[Dict[str, Any]], previous: Dict[str, Dict[str, Any]]) -> None:
+    if not results:
+        return
+    print(title)
+    print(f"{'scenario':<13}{'klienter':>9}{'anrop':>8}{'fel':>6}{'req/s':>9}"
+          f"{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}{'Δ p99':>9}")
+    for r in results:
+        prev = previous.get(r["scenario"])
+        delta = f"{(r['p99_ms'] / prev['p99_ms'] - 1) * 100:+.0f}%" if prev and prev["p99_ms"] else "-"
+        print(f"{r['scenario']:<13}{r['clients']:>9}{r['requests']:>8}{r['errors']:>6}{r['rps']:>9.1f}"
+              f"{r['p50_ms']:>9.1f}{r['p90_ms']:>9.1f}{r['p99_ms']:>9.1f}{r['max_ms']:>9.1f}{delta:>9}")
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Lasttest av Tipsbot mot lokala stand-ins")
+    ap.add_argument("--clients", type=int, default=4, help="samtidiga klienter per scenario")
+    ap.add_argument("--duration", type=float, default=10.0, help="sekunder per scenario")
+    ap.add_argument("--latency-ms", type=float, default=100.0, help="medellatens i stand-in-servrarna")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="andel 503-svar från stand-ins (0-1)")
+    ap.add_argument("--no-etag", action="store_true", help="stand-ins skickar ingen ETag och svarar aldrig 304")
+    ap.add_argument("--warmup-attempts", type=int, default=5, help="försök att hämta en kupong innan excel-scenariot")
+    ap.add_argument("--scenarios", default="svenskaspel,excel,footy", help="kommaseparerad lista")
+    ap.add_argument("--out", help="spara resultatet som JSON")
+    ap.add_argument("--compare", help="JSON från tidigare körning att jämföra med")
+    args = ap.parse_args()
+    names = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+
+    stryket = _start_stand_in("stryket_synthetic.html", args.latency_ms, args.error_rate, not args.no_etag)
+    footy = _start_stand_in("footy_synthetic.html", args.latency_ms, args.error_rate, not args.no_etag)
+    # footy-scrapern körs i den här processen
+    os.environ["FOOTY_ORIGIN"] = footy.origin
+
+    port = _free_port()
+    snapshot_dir = tempfile.mkdtemp(prefix="tipsbot_loadtest_")
+    app = _start_app(port, {"STRYKET_ORIGIN": stryket.origin, "SNAPSHOT_DIR": snapshot_dir})
+    base = f"http://127.0.0.1:{port}"
+
+    try:
+        # /excel kräver en kupong i minnet (stand-in kan svara 503, så försök några gånger)
+        warm = any(requests.post(f"{base}/svenskaspel", json={"url": STRYKET_URL}, timeout=60).ok
+                   for _ in range(args.warmup_attempts))
+        if not warm and "excel" in names:
+            # annars mäter excel-scenariot bara 404-svar
+            sys.exit(f"Ingen kupong efter {args.warmup_attempts} försök (--error-rate {args.error_rate}) "
+                     f"– excel-scenariot kan inte köras.")
+
+        app_available = _app_scenarios(base)
+        scraper_available = _scraper_scenarios()
+        results: List[Dict[str, Any]] = []
+        for name in names:
+            if name in app_available:
+                results.append({**_drive(name, app_available[name], args.clients, args.duration), "kind": "app"})
+            elif name in scraper_available:
+                results.append({**_drive(name, scraper_available[name], args.clients, args.duration),
+                                "kind": "scraper-only"})
+            else:
+                sys.exit(f"Okänt scenario: {name} (finns: {', '.join([*app_available, *scraper_available])})")
+    finally:
+        app.terminate()
+        app.wait(timeout=10)
+        stryket.shutdown(); footy.shutdown()
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+
+    previous: Dict[str, Dict[str, Any]] = {}
+    if args.compare:
+        prev_run = json.loads(pathlib.Path(args.compare).read_text(encoding="utf-8"))
+        previous = {r["scenario"]: r for r in prev_run["results"]}
+        prev_etag = not prev_run["config"].get("no_etag", False)
+        if prev_etag != (not args.no_etag):
+            print(f"obs: jämför {'med' if not args.no_etag else 'utan'} ETag mot en körning "
+                  f"{'med' if prev_etag else 'utan'} ETag")
+    _print_report("App (uvicorn main:app i egen process):",
+                  [r for r in results if r["kind"] == "app"], previous)
+    _print_report("Endast scraper (körs i lastgeneratorn, ingen app inblandad):",
+                  [r for r in results if r["kind"] == "scraper-only"], previous)
+    print(f"stand-in-svar: stryket {stryket.statuses}, footy {footy.statuses}")
+
+    if args.out:
+        out = pathlib.Path(args.out)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        run = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+            "upstream_hits": {"stryket": stryket.hits, "footy": footy.hits},
+            "upstream_statuses": {"stryket": stryket.statuses, "footy": footy.statuses},
+            "results": results,
+        }
+        out.write_text(json.dumps(run, indent=2) + "\n", encoding="utf-8")
+        print(f"resultat sparat i {out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
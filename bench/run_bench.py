@@ -0,0 +1,314 @@
+# bench/run_bench.py – offline-benchmark för parsers och Excel-export
+# - kör varje parser mot sparade sidor i bench/fixtures/ (inget nätverk)
+# - jämför resultatet med handgranskat facit i bench/golden/
+# - mäter tid per körning, genomströmning, max-minne och allokeringar (tracemalloc)
+# - flaggar regressioner mot en lokal bench/baseline.json (maskinberoende, ej i git)
+#
+# Användning (från repo-roten):
+#   python bench/run_bench.py --update-baseline   # första gången på en maskin
+#   python bench/run_bench.py                     # kör allt, exit 1 vid fel/regression
+#   python bench/run_bench.py --update-golden     # skriv facit från nuvarande parsers – granska diffen!
+#   python bench/run_bench.py --record kupong_v38 # spara senaste debug-snapshot som fixture
+#
+# Fixtures med "synthetic" i namnet är handskrivna sidor, inte inspelade.
+
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Tuple
+import argparse
+import gc
+import gzip
+import json
+import re
+import os
+import pathlib
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from bs4 import BeautifulSoup
+from openpyxl import Workbook, load_workbook
+
+import excel_utils
+import scrape_footy
+import scrape_stryket
+import scrape_svspel
+from main import EXCEL_COLUMNS, build_excel
+from models import MatchRow, rows_to_dicts
+from snapshots import SNAPSHOTS
+
+BENCH_DIR = pathlib.Path(__file__).resolve().parent
+FIXTURES = BENCH_DIR / "fixtures"
+GOLDEN = BENCH_DIR / "golden"
+BASELINE = BENCH_DIR / "baseline.json"
+
+# ---------------------------------
+# Parsers: html -> JSON-jämförbart resultat
+# ---------------------------------
+def _run_stryket(html: str) -> Any:
+    return rows_to_dicts(scrape_stryket._extract_matches(BeautifulSoup(html, "html.parser")))
+
+def _run_svspel(html: str) -> Any:
+    return rows_to_dicts(scrape_svspel._parse(html))
+
+def _run_footy(html: str) -> Any:
+    return scrape_footy._extract_footy(BeautifulSoup(html, "html.parser"), "fixture")
+
+# prefix på fixture-filen avgör vilken parser som används
+PARSERS: Dict[str, Callable[[str], Any]] = {
+    "stryket": _run_stryket,
+    "svspel": _run_svspel,
+    "footy": _run_footy,
+}
+
+# ---------------------------------
+# Mätning
+# ---------------------------------
+# varje mätpunkt ska ta minst så här lång tid – snabba fall körs flera gånger per punkt
+MIN_SAMPLE_S = 0.02
+# minsta ökning av kvarlämnade block som räknas som regression
+MIN_ALLOC_DELTA = 50
+
+def _measure(fn: Callable[[], Any], repeat: int, with_memory: bool = True) -> Dict[str, float]:
+    t0 = time.perf_counter()
+    fn()  # uppvärmning (regex-cache, imports)
+    first = time.perf_counter() - t0
+    inner = max(1, int(MIN_SAMPLE_S / max(first, 1e-6)))
+    times: List[float] = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(inner):
+            fn()
+        times.append((time.perf_counter() - t0) / inner)
+
+    out = {
+        "median_ms": statistics.median(times) * 1000,
+        "min_ms": min(times) * 1000,
+    }
+    if with_memory:
+        # minne mäts i separat körning så att tracemalloc inte påverkar tiderna
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        start, _ = tracemalloc.get_traced_memory()   # snapshoten ovan ligger också i minnet
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+        peak -= start
+        gc.collect()   # cykliskt skräp ska inte räknas som kvarlämnat
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        out["peak_kb"] = peak / 1024
+        out["allocs"], out["alloc_kb"] = _allocations(before, after)
+        del result
+        out["norm"] = out["min_ms"] / _calibrate()
+    return out
+
+_NOT_TRACEMALLOC = (tracemalloc.Filter(False, tracemalloc.__file__),)
+
+def _allocations(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot) -> Tuple[int, float]:
+    """Block och KB som körningen lämnat kvar (resultatet + cacher), per fil summerat.
+    Tillfälliga allokeringar som hunnit frias syns bara i peak_kb."""
+    diff = after.filter_traces(_NOT_TRACEMALLOC).compare_to(before.filter_traces(_NOT_TRACEMALLOC), "filename")
+    return sum(max(0, d.count_diff) for d in diff), sum(max(0, d.size_diff) for d in diff) / 1024
+
+# kalibrering: fast referensjobb (html.parser + regex, som parsarna) som körs före varje
+# benchmark – tiderna jämförs som kvot mot den, så att maskinens aktuella takt tar ut sig
+_CALIB_HTML = "<div class='match'><span>1</span> Lag A - Lag B <span>Odds 2.10 3.40 3.20</span></div>" * 40
+
+def _calibrate() -> float:
+    def job() -> None:
+        txt = BeautifulSoup(_CALIB_HTML, "html.parser").get_text(" ", strip=True)
+        re.findall(r"Odds\s+(\d+[.,]\d+)\s+(\d+[.,]\d+)\s+(\d+[.,]\d+)", txt)
+    return _measure(job, 5, with_memory=False)["min_ms"]
+
+def _golden_path(name: str) -> pathlib.Path:
+    return GOLDEN / f"{name}.json"
+
+def _check_golden(name: str, result: Any, update: bool) -> str:
+    path = _golden_path(name)
+    if update:
+        path.write_text(json.dumps(result, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        return "skriven"
+    if not path.exists():
+        # facit skrivs aldrig automatiskt – det ska vara granskade värden
+        return "SAKNAS"
+    expected = json.loads(path.read_text(encoding="utf-8"))
+    return "ok" if expected == json.loads(json.dumps(result)) else "AVVIKER"
+
+# ---------------------------------
+# Benchmarks
+# ---------------------------------
+def bench_parsers(repeat: int, update_golden: bool) -> List[Dict[str, Any]]:
+    out: List[Dict[str, Any]] = []
+    for path in sorted(FIXTURES.glob("*.html")):
+        kind = path.stem.split("_", 1)[0]
+        parse = PARSERS.get(kind)
+        if not parse:
+            print(f"hoppar över {path.name}: okänd parser '{kind}'", file=sys.stderr)
+            continue
+        html = path.read_text(encoding="utf-8")
+        name = path.stem
+        stats = _measure(lambda: parse(html), repeat)
+        stats["mb_per_s"] = (len(html.encode("utf-8")) / 1e6) / (stats["median_ms"] / 1000)
+        stats["golden"] = _check_golden(name, parse(html), update_golden)
+        out.append({"name": name, **stats})
+    return out
+
+def _excel_rows() -> List[MatchRow]:
+    # raderna från den stryket-fixtur som ger flest matcher (en full kupong)
+    parsed = [scrape_stryket._extract_matches(BeautifulSoup(p.read_text(encoding="utf-8"), "html.parser"))
+              for p in sorted(FIXTURES.glob("stryket_*.html"))]
+    return max(parsed, key=len)
+
+def _kupong_template(path: pathlib.Path) -> None:
+    # minimal arbetsbok med de kolumner update_kupong kräver
+    wb = Workbook()
+    ws = wb.active
+    ws.title = excel_utils.SHEET
+    headers = [
+        "Matchnr", "Hemmalag", "Bortalag",
+        "Odds % 1", "Odds % X", "Odds % 2",
+        "Folk % 1", "Folk % X", "Folk % 2",
+        "Värde 1", "Värde X", "Värde 2",
+    ]
+    ws.append(headers)
+    for nr in range(1, 14):
+        ws.append([nr] + [None] * (len(headers) - 1))
+    wb.save(path)
+
+def bench_excel(repeat: int) -> List[Dict[str, Any]]:
+    rows = _excel_rows()
+    expected = [list(r.excel_values()) for r in rows]
+    out: List[Dict[str, Any]] = []
+
+    # build_excel: läs tillbaka och jämför med raderna
+    stats = _measure(lambda: build_excel(rows), repeat)
+    tmp = tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False)
+    try:
+        tmp.write(build_excel(rows)); tmp.close()
+        ws = load_workbook(tmp.name).active
+        got = [list(r) for r in ws.iter_rows(min_row=2, max_col=len(EXCEL_COLUMNS), values_only=True)]
+    finally:
+        os.unlink(tmp.name)
+    stats["golden"] = "ok" if got == expected else "AVVIKER"
+    out.append({"name": "excel_build", **stats})
+
+    # update_kupong: kör mot en temporär kopia, aldrig mot MASTER-filen
+    with tempfile.TemporaryDirectory() as d:
+        path = pathlib.Path(d) / "kupong.xlsx"
+        _kupong_template(path)
+        orig = excel_utils.EXCEL_PATH
+        excel_utils.EXCEL_PATH = str(path)
+        try:
+            stats = _measure(lambda: excel_utils.update_kupong(rows), repeat)
+        finally:
+            excel_utils.EXCEL_PATH = orig
+        ws = load_workbook(path)[excel_utils.SHEET]
+        got = [list(r) for r in ws.iter_rows(min_row=2, max_col=12, values_only=True) if r[1] is not None]
+        stats["golden"] = "ok" if got == expected else "AVVIKER"
+    out.append({"name": "excel_update_kupong", **stats})
+    return out
+
+# ---------------------------------
+# Baseline / rapport
+# ---------------------------------
+def _golden_problems(results: List[Dict[str, Any]]) -> List[str]:
+    problems: List[str] = []
+    for r in results:
+        if r["golden"] == "AVVIKER":
+            problems.append(f"{r['name']}: resultatet avviker från facit")
+        if r["golden"] == "SAKNAS":
+            problems.append(f"{r['name']}: facit saknas – skriv och granska bench/golden/{r['name']}.json")
+    return problems
+
+def _compare(results: List[Dict[str, Any]], baseline: Dict[str, Any],
+             time_tol: float, mem_tol: float, min_delta_ms: float) -> List[str]:
+    problems: List[str] = []
+    for r in results:
+        b = baseline.get(r["name"])
+        if not b:
+            continue
+        # bästa tiden relativt kalibreringsjobbet jämförs (tål att maskinen går olika fort);
+        # både relativ och absolut ökning krävs, bruset dominerar för fall under någon ms
+        slower = r["min_ms"] - b["min_ms"]
+        if r["norm"] > b["norm"] * (1 + time_tol) and slower > min_delta_ms:
+            problems.append(f"{r['name']}: {r['norm']:.3f}x kalibrering mot baseline {b['norm']:.3f}x "
+                            f"({r['min_ms']:.2f} / {b['min_ms']:.2f} ms)")
+        if r["peak_kb"] > b["peak_kb"] * (1 + mem_tol):
+            problems.append(f"{r['name']}: {r['peak_kb']:.0f} KB mot baseline {b['peak_kb']:.0f} KB")
+        # openpyxl lämnar några tiotal block i varierande cacher – kräv även en absolut ökning
+        if ("allocs" in b and r["allocs"] > b["allocs"] * (1 + mem_tol)
+                and r["allocs"] - b["allocs"] > MIN_ALLOC_DELTA):
+            problems.append(f"{r['name']}: {r['allocs']} allokeringar mot baseline {b['allocs']}")
+    return problems
+
+def _print_table(results: List[Dict[str, Any]], baseline: Dict[str, Any]) -> None:
+    print(f"{'benchmark':<28}{'median ms':>11}{'min ms':>9}{'MB/s':>8}{'peak KB':>10}{'allok':>8}{'Δ norm':>9}  facit")
+    for r in results:
+        b = baseline.get(r["name"])
+        delta = f"{(r['norm'] / b['norm'] - 1) * 100:+.0f}%" if b and b.get("norm") else "-"
+        mbps = f"{r['mb_per_s']:.2f}" if "mb_per_s" in r else "-"
+        print(f"{r['name']:<28}{r['median_ms']:>11.2f}{r['min_ms']:>9.2f}{mbps:>8}"
+              f"{r['peak_kb']:>10.0f}{r['allocs']:>8}{delta:>9}  {r['golden']}")
+
+def _record(name: str) -> None:
+    meta = SNAPSHOTS.latest()
+    if not meta:
+        sys.exit(f"Ingen snapshot att spara ({SNAPSHOTS.directory}). Kör /svenskaspel med debug=true först.")
+    dst = FIXTURES / f"{meta['source']}_{name}.html"
+    with gzip.open(SNAPSHOTS.html_path(meta["id"]), "rb") as src, open(dst, "wb") as out:
+        shutil.copyfileobj(src, out)
+    print(f"sparade {dst.relative_to(ROOT)} – skriv bench/golden/{dst.stem}.json med kontrollerade värden")
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Offline-benchmark för Tipsbot-parsers")
+    ap.add_argument("--repeat", type=int, default=20, help="antal mätta körningar per benchmark")
+    ap.add_argument("--update-golden", action="store_true", help="skriv om facit från nuvarande resultat")
+    ap.add_argument("--update-baseline", action="store_true", help="spara nuvarande siffror som baseline")
+    ap.add_argument("--time-tolerance", type=float, default=0.5, help="tillåten tidsökning (0.5 = +50%%)")
+    ap.add_argument("--mem-tolerance", type=float, default=0.2, help="tillåten minnesökning (0.2 = +20%%)")
+    ap.add_argument("--min-delta-ms", type=float, default=1.0, help="minsta absoluta tidsökning som räknas som regression")
+    ap.add_argument("--record", metavar="NAMN", help="spara senaste debug-snapshot som fixture")
+    args = ap.parse_args()
+
+    if args.record:
+        _record(args.record)
+        return 0
+
+    results = bench_parsers(args.repeat, args.update_golden) + bench_excel(args.repeat)
+    if args.update_golden:
+        print("facit omskrivet – granska `git diff bench/golden` mot sidorna innan commit", file=sys.stderr)
+    baseline = json.loads(BASELINE.read_text(encoding="utf-8")) if BASELINE.exists() else {}
+    _print_table(results, baseline)
+
+    golden_problems = _golden_problems(results)
+    if args.update_baseline:
+        if golden_problems:
+            # tider från fel resultat är ingen baseline
+            for p in golden_problems:
+                print(f"FEL: {p}", file=sys.stderr)
+            print("baseline inte sparad – rätta facit/parsers först", file=sys.stderr)
+            return 1
+        data = {r["name"]: {"median_ms": round(r["median_ms"], 3), "min_ms": round(r["min_ms"], 3),
+                            "norm": round(r["norm"], 4), "peak_kb": round(r["peak_kb"], 1),
+                            "allocs": r["allocs"], "alloc_kb": round(r["alloc_kb"], 1)}
+                for r in results}
+        BASELINE.write_text(json.dumps(data, indent=2) + "\n", encoding="utf-8")
+        print(f"baseline sparad i {BASELINE.relative_to(ROOT)}")
+        return 0
+
+    if not baseline:
+        print("ingen lokal baseline – kör med --update-baseline för att jämföra tider", file=sys.stderr)
+    problems = golden_problems + _compare(results, baseline, args.time_tolerance, args.mem_tolerance,
+                                          args.min_delta_ms)
+    for p in problems:
+        print(f"REGRESSION: {p}", file=sys.stderr)
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,6 +4,9 @@ from typing import Dict, Any, List, Optional
 from openpyxl import load_workbook
 from openpyxl.worksheet.worksheet import Worksheet
 
+from metrics import timed
+from models import MatchRow
+
 EXCEL_PATH = "Stryktipsanalys_MASTER.xlsx"
 SHEET = "Data"
 
@@ -25,8 +28,12 @@ def _find_row_by_matchnr(ws: Worksheet, hdr: Dict[str, int], matchnr: int) -> Op
             return r
     return None
 
-def update_kupong(rows: List[Dict[str, Any]]) -> None:
+def update_kupong(rows: List[MatchRow]) -> None:
     """Skriv in stryket-data (odds, folk, spelvärde) – kolumnerna antas redan finnas."""
+    with timed("excel.update_kupong"):
+        _update_kupong(rows)
+
+def _update_kupong(rows: List[MatchRow]) -> None:
     wb = load_workbook(EXCEL_PATH)
     ws = wb[SHEET]
     hdr = _header_map(ws)
@@ -42,20 +49,20 @@ def update_kupong(rows: List[Dict[str, Any]]) -> None:
         raise RuntimeError(f"Saknar kolumner i Excel: {miss}")
 
     for row in rows:
-        r = _find_row_by_matchnr(ws, hdr, row["matchnr"])
+        r = _find_row_by_matchnr(ws, hdr, row.matchnr)
         if not r:
             continue
-        ws.cell(r, hdr["Hemmalag"]).value = row["hemmalag"]
-        ws.cell(r, hdr["Bortalag"]).value = row["bortalag"]
-        ws.cell(r, hdr["Odds % 1"]).value = row.get("odds_1")
-        ws.cell(r, hdr["Odds % X"]).value = row.get("odds_x")
-        ws.cell(r, hdr["Odds % 2"]).value = row.get("odds_2")
-        ws.cell(r, hdr["Folk % 1"]).value = row.get("folk_1")
-        ws.cell(r, hdr["Folk % X"]).value = row.get("folk_x")
-        ws.cell(r, hdr["Folk % 2"]).value = row.get("folk_2")
-        ws.cell(r, hdr["Värde 1"]).value = row.get("spelv_1")
-        ws.cell(r, hdr["Värde X"]).value = row.get("spelv_x")
-        ws.cell(r, hdr["Värde 2"]).value = row.get("spelv_2")
+        ws.cell(r, hdr["Hemmalag"]).value = row.hemmalag
+        ws.cell(r, hdr["Bortalag"]).value = row.bortalag
+        ws.cell(r, hdr["Odds % 1"]).value = row.odds_1
+        ws.cell(r, hdr["Odds % X"]).value = row.odds_x
+        ws.cell(r, hdr["Odds % 2"]).value = row.odds_2
+        ws.cell(r, hdr["Folk % 1"]).value = row.folk_1
+        ws.cell(r, hdr["Folk % X"]).value = row.folk_x
+        ws.cell(r, hdr["Folk % 2"]).value = row.folk_2
+        ws.cell(r, hdr["Värde 1"]).value = row.spelv_1
+        ws.cell(r, hdr["Värde X"]).value = row.spelv_x
+        ws.cell(r, hdr["Värde 2"]).value = row.spelv_2
 
     wb.save(EXCEL_PATH)
 
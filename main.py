@@ -1,23 +1,54 @@
 # main.py — FastAPI backend för Tipsbot (Render)
 # - Hämtar Stryktips-data från Stryketanalysen (scrape_stryket.fetch_stryket)
 # - Exponerar /svenskaspel, /excel, /health, /reset, /debug/state
-# - Tjänar /debug/stryket.html via static mount
+# - Tjänar /debug/stryket.html (senaste snapshot) och /debug/snapshots
+# - ETag/Last-Modified + 304 och gzip för alla svar (mindre trafik till Pythonista)
+# - /metrics i Prometheus-format (stegtider, cache, upstream-status, browsers)
 
-from fastapi import FastAPI, HTTPException, Response
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-from typing import List, Dict, Any
-from datetime import datetime
+from typing import List, Dict, Any, BinaryIO, Callable, Iterator, Optional
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+import gzip
 import io
 import os
 import pathlib
+import threading
+import uuid
 
 from openpyxl import Workbook
 from openpyxl.utils import get_column_letter
 
 # ---- importera vår scraper ----
-from scrape_stryket import fetch_stryket, DEBUG_HTML_PATH, STATIC_DIR
+from scrape_stryket import fetch_stryket, STATIC_DIR
+from models import MatchRow, rows_to_dicts
+import metrics
+from metrics import timed
+from snapshots import SNAPSHOTS
+
+# ---------------------------------
+# Gzip (utom för vissa sökvägar)
+# ---------------------------------
+class _SelectiveGZip:
+    """GZipMiddleware utom för sökvägar vars innehåll redan är komprimerat (xlsx är en zip)
+    eller som själva väljer kodning (snapshots skickas som sparad .gz)."""
+    def __init__(self, app, skip_paths=(), skip_prefixes=(), **kwargs):
+        self.app = app
+        self.gzip = GZipMiddleware(app, **kwargs)
+        self.skip_paths = set(skip_paths)
+        self.skip_prefixes = tuple(skip_prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and (scope["path"] in self.skip_paths
+                                        or scope["path"].startswith(self.skip_prefixes)):
+            await self.app(scope, receive, send)
+        else:
+            await self.gzip(scope, receive, send)
 
 # ---------------------------------
 # App & CORS
@@ -32,31 +63,175 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# komprimera svar över ~1 KB om klienten tillåter gzip
+app.add_middleware(_SelectiveGZip, minimum_size=1000,
+                   skip_paths={"/excel", "/debug/stryket.html"}, skip_prefixes=("/debug/snapshots/",))
+
 # se till att static-katalogen finns och mounta
 STATIC_DIR.mkdir(exist_ok=True)
 app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
 
-# Bekväm alias för debug-HTML (så du kan öppna /debug/stryket.html)
-@app.get("/debug/stryket.html")
-def debug_stryket_html_redirect():
-    # Render har redan mountat /static – men vi ger en enkel redirect-lösning
-    if DEBUG_HTML_PATH.exists():
-        return Response(
-            content=(DEBUG_HTML_PATH.read_text(encoding="utf-8")),
-            media_type="text/html; charset=utf-8",
-            status_code=200
-        )
-    return Response(content="Ingen debug-HTML sparad ännu.", media_type="text/plain; charset=utf-8", status_code=404)
-
 # ---------------------------------
 # State i minne
 # ---------------------------------
+# sync-endpoints körs parallellt i threadpoolen – rader, version och cache byts under låset
+STATE_LOCK = threading.Lock()
 STATE: Dict[str, Any] = {
+    "version": 0,        # ökas vid varje ändring – grund för ETag
     "last_url": None,
     "last_fetch_ts": None,
-    "svenskaspel": [],   # list[dict] med 13 matcher
+    "svenskaspel": [],   # list[MatchRow] med 13 matcher
+    "excel_cache": None, # (version, bytes) – byggd Excel för aktuell version
 }
 
+# ---------------------------------
+# Hjälp: villkorade GET (ETag / Last-Modified -> 304)
+# ---------------------------------
+# version börjar om på 0 vid varje omstart (Render) – boot-id:t gör att gamla ETags inte matchar
+BOOT_ID = uuid.uuid4().hex[:8]
+
+def _state_etag(prefix: str, version: int) -> str:
+    return f'W/"{prefix}-{BOOT_ID}-{version}"'
+
+def _parse_ts(ts: Optional[str]) -> Optional[datetime]:
+    if not ts:
+        return None
+    return datetime.fromisoformat(ts).replace(tzinfo=timezone.utc)
+
+def _current() -> Dict[str, Any]:
+    # anropas med STATE_LOCK taget
+    return {
+        "version": STATE["version"],
+        "rows": STATE["svenskaspel"],
+        "last_url": STATE["last_url"],
+        "last_fetch_ts": STATE["last_fetch_ts"],
+    }
+
+def _state_snapshot() -> Dict[str, Any]:
+    """Konsistent kopia av (version, rader, url, tid) – läs alltid via denna."""
+    with STATE_LOCK:
+        return _current()
+
+def _validators(etag: str, last_modified: Optional[datetime]) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    return headers
+
+def _not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> Optional[Response]:
+    """Returnerar ett 304-svar om klientens validerare fortfarande stämmer, annars None."""
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        tags = [t.strip() for t in inm.split(",")]
+        # svag jämförelse enligt RFC 9110
+        bare = etag.removeprefix("W/")
+        hit = "*" in tags or any(t.removeprefix("W/") == bare for t in tags)
+        metrics.cache_hit("http_conditional", hit)
+        return Response(status_code=304, headers=_validators(etag, last_modified)) if hit else None
+    ims = request.headers.get("if-modified-since")
+    if ims and last_modified:
+        try:
+            since = parsedate_to_datetime(ims)
+        except (TypeError, ValueError):
+            return None
+        hit = last_modified.replace(microsecond=0) <= since
+        metrics.cache_hit("http_conditional", hit)
+        if hit:
+            return Response(status_code=304, headers=_validators(etag, last_modified))
+    return None
+
+def _set_coupon(rows: List[MatchRow], url: Optional[str]) -> Dict[str, Any]:
+    """Byter kupong, tid, version och Excel-cache i ett steg. Returnerar den nya ögonblicksbilden."""
+    with STATE_LOCK:
+        STATE["version"] += 1
+        STATE["svenskaspel"] = rows
+        STATE["last_url"] = url
+        STATE["last_fetch_ts"] = datetime.utcnow().isoformat() if rows else None
+        STATE["excel_cache"] = None
+        return _current()
+
+def _snapshot_ts(meta: Dict[str, Any]) -> datetime:
+    return datetime.strptime(meta["ts"], "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    """True om gzip är tillåtet enligt Accept-Encoding (q=0 betyder "inte okej")."""
+    q_by_coding: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, *params = [p.strip() for p in part.split(";")]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        q_by_coding[coding.lower()] = q
+    return q_by_coding.get("gzip", q_by_coding.get("*", 0.0)) > 0
+
+def _open_snapshot_file(open_file: Callable[[], BinaryIO]) -> BinaryIO:
+    # öppna direkt i handlern: skrivtråden kan ta bort filen (ringbufferten) när
+    # som helst, men en redan öppnad fil går att läsa klart
+    try:
+        return open_file()
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Snapshot saknas på disk.")
+
+def _stream_file(f: BinaryIO) -> Iterator[bytes]:
+    with f:
+        while chunk := f.read(64 * 1024):
+            yield chunk
+
+def _snapshot_html(request: Request, meta: Dict[str, Any]) -> Response:
+    """Strömmar en sparad snapshot från disk – gzip rakt av om klienten klarar det."""
+    path = SNAPSHOTS.html_path(meta["id"])
+    use_gzip = _accepts_gzip(request.headers.get("accept-encoding", ""))
+    # olika bytes per kodning -> olika ETag, och cachar måste skilja på dem (Vary)
+    etag = f'"{meta["id"]}-gz"' if use_gzip else f'"{meta["id"]}"'
+    last_modified = _snapshot_ts(meta)
+    cached = _not_modified(request, etag, last_modified)
+    if cached:
+        cached.headers["Vary"] = "Accept-Encoding"
+        return cached
+    headers = {**_validators(etag, last_modified), "Vary": "Accept-Encoding"}
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        f = _open_snapshot_file(lambda: path.open("rb"))
+    else:
+        f = _open_snapshot_file(lambda: gzip.open(path, "rb"))
+    return StreamingResponse(_stream_file(f), media_type="text/html; charset=utf-8", headers=headers)
+
+# Bekväm alias för debug-HTML (så du kan öppna /debug/stryket.html)
+@app.get("/debug/stryket.html")
+def debug_stryket_html_redirect(request: Request):
+    meta = SNAPSHOTS.latest("stryket")
+    if not meta:
+        return Response(content="Ingen debug-HTML sparad ännu.", media_type="text/plain; charset=utf-8", status_code=404)
+    return _snapshot_html(request, meta)
+
+@app.get("/debug/snapshots")
+def debug_snapshots():
+    """Metadata för sparade snapshots (nyast först)."""
+    return {"snapshots": SNAPSHOTS.list()}
+
+@app.get("/debug/snapshots/{sid}")
+def debug_snapshot(sid: str, request: Request):
+    meta = SNAPSHOTS.get(sid)
+    if not meta:
+        raise HTTPException(status_code=404, detail="Okänd snapshot.")
+    return _snapshot_html(request, meta)
+
+@app.get("/debug/snapshots/{sid}/screenshot.png")
+def debug_snapshot_screenshot(sid: str):
+    meta = SNAPSHOTS.get(sid)
+    if not meta or not meta.get("has_screenshot"):
+        raise HTTPException(status_code=404, detail="Ingen skärmdump för denna snapshot.")
+    f = _open_snapshot_file(lambda: SNAPSHOTS.screenshot_path(sid).open("rb"))
+    return StreamingResponse(_stream_file(f), media_type="image/png",
+                             headers={"ETag": f'"{sid}-png"', "Cache-Control": "max-age=86400, immutable"})
+
 # ---------------------------------
 # Models
 # ---------------------------------
@@ -83,36 +258,24 @@ EXCEL_COLUMNS = [
     ("Spelvärde_2", 12),
 ]
 
-def build_excel(data: List[Dict[str, Any]]) -> bytes:
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Kupong"
-
-    # rubriker
-    for col_idx, (title, width) in enumerate(EXCEL_COLUMNS, start=1):
-        c = ws.cell(row=1, column=col_idx, value=title)
-        ws.column_dimensions[get_column_letter(col_idx)].width = width
-
-    # rader
-    row_idx = 2
-    for row in data:
-        ws.cell(row=row_idx, column=1,  value=row.get("matchnr"))
-        ws.cell(row=row_idx, column=2,  value=row.get("hemmalag"))
-        ws.cell(row=row_idx, column=3,  value=row.get("bortalag"))
-        ws.cell(row=row_idx, column=4,  value=row.get("odds_1"))
-        ws.cell(row=row_idx, column=5,  value=row.get("odds_x"))
-        ws.cell(row=row_idx, column=6,  value=row.get("odds_2"))
-        ws.cell(row=row_idx, column=7,  value=row.get("folk_1"))
-        ws.cell(row=row_idx, column=8,  value=row.get("folk_x"))
-        ws.cell(row=row_idx, column=9,  value=row.get("folk_2"))
-        ws.cell(row=row_idx, column=10, value=row.get("spelv_1"))
-        ws.cell(row=row_idx, column=11, value=row.get("spelv_x"))
-        ws.cell(row=row_idx, column=12, value=row.get("spelv_2"))
-        row_idx += 1
-
-    bio = io.BytesIO()
-    wb.save(bio)
-    return bio.getvalue()
+def build_excel(data: List[MatchRow]) -> bytes:
+    with timed("excel.build"):
+        wb = Workbook()
+        ws = wb.active
+        ws.title = "Kupong"
+
+        # rubriker
+        for col_idx, (title, width) in enumerate(EXCEL_COLUMNS, start=1):
+            c = ws.cell(row=1, column=col_idx, value=title)
+            ws.column_dimensions[get_column_letter(col_idx)].width = width
+
+        # rader (värdena kommer i samma ordning som EXCEL_COLUMNS)
+        for row in data:
+            ws.append(row.excel_values())
+
+        bio = io.BytesIO()
+        wb.save(bio)
+        return bio.getvalue()
 
 # ---------------------------------
 # Endpoints
@@ -121,47 +284,78 @@ def build_excel(data: List[Dict[str, Any]]) -> bytes:
 def health():
     return {"ok": True, "ts": datetime.utcnow().isoformat()}
 
+@app.get("/metrics")
+def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.post("/reset")
 def reset():
-    STATE["last_url"] = None
-    STATE["last_fetch_ts"] = None
-    STATE["svenskaspel"] = []
-    # töm debug-html
-    try:
-        if DEBUG_HTML_PATH.exists():
-            DEBUG_HTML_PATH.unlink()
-    except Exception:
-        pass
+    _set_coupon([], None)
+    # töm debug-snapshots (listan direkt, filerna i bakgrunden)
+    SNAPSHOTS.clear()
     return {"ok": True}
 
 @app.get("/debug/state")
-def debug_state():
-    return {
-        "last_url": STATE["last_url"],
-        "last_fetch_ts": STATE["last_fetch_ts"],
-        "svenskaspel_rows": len(STATE["svenskaspel"]),
-        "debug_html_exists": DEBUG_HTML_PATH.exists(),
+def debug_state(request: Request):
+    snapshots = SNAPSHOTS.list()
+    latest_id = snapshots[0]["id"] if snapshots else "none"
+    snap = _state_snapshot()
+    etag = _state_etag(f"state-{latest_id}", snap["version"])
+    # svaret ändras både när kupongen hämtas och när en ny snapshot sparas
+    stamps = [t for t in (_parse_ts(snap["last_fetch_ts"]),
+                          _snapshot_ts(snapshots[0]) if snapshots else None) if t]
+    last_modified = max(stamps) if stamps else None
+    cached = _not_modified(request, etag, last_modified)
+    if cached:
+        return cached
+    body = {
+        "version": snap["version"],
+        "last_url": snap["last_url"],
+        "last_fetch_ts": snap["last_fetch_ts"],
+        "svenskaspel_rows": len(snap["rows"]),
+        "debug_html_exists": SNAPSHOTS.latest("stryket") is not None,
+        "snapshots": len(snapshots),
     }
+    return JSONResponse(body, headers=_validators(etag, last_modified))
+
+@app.get("/svenskaspel")
+def svenskaspel_cached(request: Request):
+    """Senast hämtade kupong ur minnet – billig att polla med If-None-Match."""
+    snap = _state_snapshot()
+    if not snap["rows"]:
+        raise HTTPException(status_code=404, detail="Ingen kupongdata i minnet ännu. Kör POST /svenskaspel först.")
+    etag = _state_etag("svs", snap["version"])
+    last_modified = _parse_ts(snap["last_fetch_ts"])
+    cached = _not_modified(request, etag, last_modified)
+    if cached:
+        return cached
+    return JSONResponse(
+        {"svenskaspel": rows_to_dicts(snap["rows"])},
+        headers=_validators(etag, last_modified),
+    )
 
 @app.post("/svenskaspel")
 def svenskaspel(req: SvsReq):
     try:
         # just nu: endast Stryketanalysen-vägen
-        if "stryketanalysen.se" in (req.url or ""):
-            result = fetch_stryket(req.url, debug=req.debug)
-        else:
+        if "stryketanalysen.se" not in (req.url or ""):
             raise HTTPException(status_code=400, detail="Okänd URL-källa. Ange Stryketanalysen-URL.")
+        # debug=True ger även stegtider i svaret
+        with metrics.profile(req.debug) as timings:
+            with timed("svenskaspel.total"):
+                result = fetch_stryket(req.url, debug=req.debug)
 
         rows = result.get("svenskaspel") or []
         if not rows:
             raise HTTPException(status_code=502, detail="Scrape-fel: tomt resultat.")
 
-        # spara i state
-        STATE["svenskaspel"] = rows[:13]  # säkerställ 13 rader
-        STATE["last_url"] = req.url
-        STATE["last_fetch_ts"] = datetime.utcnow().isoformat()
+        # spara i state (säkerställ 13 rader)
+        snap = _set_coupon(rows[:13], req.url)
 
-        return {"svenskaspel": STATE["svenskaspel"]}
+        body: Dict[str, Any] = {"svenskaspel": rows_to_dicts(snap["rows"])}
+        if timings is not None:
+            body["timings"] = timings
+        return JSONResponse(body, headers=_validators(_state_etag("svs", snap["version"]), _parse_ts(snap["last_fetch_ts"])))
     except HTTPException:
         raise
     except Exception as e:
@@ -169,15 +363,36 @@ def svenskaspel(req: SvsReq):
         raise HTTPException(status_code=502, detail=str(e))
 
 @app.get("/excel")
-def excel():
-    rows = STATE["svenskaspel"]
+def excel(request: Request):
+    snap = _state_snapshot()
+    rows, version = snap["rows"], snap["version"]
     if not rows:
         raise HTTPException(status_code=404, detail="Ingen kupongdata i minnet ännu. Kör /svenskaspel först.")
 
-    content = build_excel(rows)
+    etag = _state_etag("xlsx", version)
+    last_modified = _parse_ts(snap["last_fetch_ts"])
+    cached = _not_modified(request, etag, last_modified)
+    if cached:
+        return cached
+
+    # bygg bara om när kupongen ändrats – cache-nyckeln är versionen raderna lästes vid
+    with STATE_LOCK:
+        entry = STATE["excel_cache"]
+    hit = entry is not None and entry[0] == version
+    metrics.cache_hit("excel", hit)
+    if hit:
+        content = entry[1]
+    else:
+        content = build_excel(rows)
+        with STATE_LOCK:
+            # spara bara om ingen ny scrape hunnit emellan
+            if STATE["version"] == version:
+                STATE["excel_cache"] = (version, content)
+
     filename = f"Stryktipsanalys_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.xlsx"
     headers = {
-        "Content-Disposition": f'attachment; filename="{filename}"'
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        **_validators(etag, last_modified),
     }
     return Response(content=content, media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", headers=headers)
 
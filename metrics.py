@@ -0,0 +1,172 @@
+# metrics.py – enkla Prometheus-mätvärden utan extra beroenden
+# - Counter / Gauge / Histogram med labels, trådsäkra
+# - timed("stage") mäter ett steg och lägger det i histogrammet
+# - record_stage("stage", s) för tider som mäts någon annanstans (t.ex. r.elapsed)
+# - profile() samlar stegtider för en enskild request (debug-läge)
+
+from __future__ import annotations
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+import threading
+import time
+
+_LOCK = threading.Lock()
+_REGISTRY: List["_Metric"] = []
+
+# sekunder – täcker allt från regex-parse (ms) till Playwright-start (tiotals s)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[str, ...]
+
+def _fmt_labels(names: Tuple[str, ...], values: LabelKey, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _fmt_num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        with _LOCK:
+            _REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> LabelKey:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines += self._samples()
+        return "\n".join(lines)
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, help, labelnames)
+        # utan labels finns exakt en serie – visa den som 0 från start
+        self._values: Dict[LabelKey, float] = {} if self.labelnames else {(): 0.0}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        k = self._key(labels)
+        with _LOCK:
+            self._values[k] = self._values.get(k, 0.0) + amount
+
+    def get(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_num(v)}"
+                for k, v in sorted(self._values.items())]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # per labelset: (bucket-räknare, summa, antal)
+        self._values: Dict[LabelKey, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        k = self._key(labels)
+        with _LOCK:
+            counts, total, n = self._values.get(k) or ([0] * len(self.buckets), 0.0, 0)
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    counts[i] += 1
+                    break
+            self._values[k] = (counts, total + value, n + 1)
+
+    def _samples(self) -> List[str]:
+        lines: List[str] = []
+        for k, (counts, total, n) in sorted(self._values.items()):
+            acc = 0
+            for b, c in zip(self.buckets, counts):
+                acc += c
+                le = f'le="{_fmt_num(b)}"'
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, k, le)} {acc}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, k)} {_fmt_num(total)}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, k)} {n}")
+        return lines
+
+def render() -> str:
+    """Alla mätvärden i Prometheus text-format (version 0.0.4)."""
+    with _LOCK:
+        metrics = list(_REGISTRY)
+    return "\n".join(m.render() for m in metrics) + "\n"
+
+# ---------------------------------
+# Mätvärden som används i appen
+# ---------------------------------
+STAGE_SECONDS = Histogram(
+    "tipsbot_stage_seconds", "Tid per steg i scrapers och Excel-export.", ("stage",))
+UPSTREAM_RESPONSES = Counter(
+    "tipsbot_upstream_responses_total", "HTTP-svar från externa källor per status.", ("source", "status"))
+CACHE_REQUESTS = Counter(
+    "tipsbot_cache_requests_total", "Cache-uppslag (hit/miss).", ("cache", "result"))
+BROWSERS_ACTIVE = Gauge(
+    "tipsbot_browsers_active", "Antal Playwright-browsers som är igång just nu.")
+BROWSER_LAUNCHES = Counter(
+    "tipsbot_browser_launches_total", "Antal startade Playwright-browsers.")
+SNAPSHOT_WRITES = Counter(
+    "tipsbot_snapshots_total", "Debug-snapshots (written/dropped/failed).", ("result",))
+
+# ---------------------------------
+# Stegtider
+# ---------------------------------
+# en lista per aktiv profile() – nästlade profiler får alla samma steg
+_PROFILE: ContextVar[Tuple[List[Dict[str, float]], ...]] = ContextVar("tipsbot_profile", default=())
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Mät ett steg, t.ex. `with timed("stryket.parse"): ...`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+def record_stage(stage: str, seconds: float) -> None:
+    """Registrera en redan uppmätt stegtid (histogram + aktiva profiler)."""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    for prof in _PROFILE.get():
+        prof.append({"stage": stage, "ms": round(seconds * 1000, 2)})
+
+@contextmanager
+def profile(enabled: bool = True) -> Iterator[Optional[List[Dict[str, float]]]]:
+    """Samla stegtider för den aktuella requesten. Ger None om enabled=False."""
+    if not enabled:
+        yield None
+        return
+    steps: List[Dict[str, float]] = []
+    token = _PROFILE.set(_PROFILE.get() + (steps,))
+    try:
+        yield steps
+    finally:
+        _PROFILE.reset(token)
+
+def cache_hit(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
@@ -1,5 +1,6 @@
+from dataclasses import dataclass
 from pydantic import BaseModel, Field, HttpUrl
-from typing import List
+from typing import Any, Dict, List, Optional, Tuple
 
 class SvsReq(BaseModel):
     url: HttpUrl
@@ -9,3 +10,50 @@ class FootyReq(BaseModel):
     matchnr: int = Field(ge=1, le=13)
     url: HttpUrl
     debug: bool = False
+
+@dataclass(slots=True)
+class MatchRow:
+    """En kupongrad (match) – delas av scrapers, Excel-export och API-svar."""
+    matchnr: int
+    hemmalag: str
+    bortalag: str
+    odds_1: Optional[float] = None
+    odds_x: Optional[float] = None
+    odds_2: Optional[float] = None
+    folk_1: Optional[int] = None
+    folk_x: Optional[int] = None
+    folk_2: Optional[int] = None
+    spelv_1: Optional[float] = None
+    spelv_x: Optional[float] = None
+    spelv_2: Optional[float] = None
+
+    def excel_values(self) -> Tuple[Any, ...]:
+        # samma ordning som kolumnerna i main.EXCEL_COLUMNS
+        return (
+            self.matchnr, self.hemmalag, self.bortalag,
+            self.odds_1, self.odds_x, self.odds_2,
+            self.folk_1, self.folk_x, self.folk_2,
+            self.spelv_1, self.spelv_x, self.spelv_2,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-form för API:t. Spelvärde utelämnas om det saknas (som tidigare)."""
+        d: Dict[str, Any] = {
+            "matchnr": self.matchnr,
+            "hemmalag": self.hemmalag,
+            "bortalag": self.bortalag,
+            "odds_1": self.odds_1,
+            "odds_x": self.odds_x,
+            "odds_2": self.odds_2,
+            "folk_1": self.folk_1,
+            "folk_x": self.folk_x,
+            "folk_2": self.folk_2,
+        }
+        if self.spelv_1 is not None or self.spelv_x is not None or self.spelv_2 is not None:
+            d["spelv_1"] = self.spelv_1
+            d["spelv_x"] = self.spelv_x
+            d["spelv_2"] = self.spelv_2
+        return d
+
+def rows_to_dicts(rows: List[MatchRow]) -> List[Dict[str, Any]]:
+    return [r.to_dict() for r in rows]
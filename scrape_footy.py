@@ -4,6 +4,9 @@ from typing import Dict, Any, Optional, Tuple, List
 import re, difflib, requests
 from bs4 import BeautifulSoup
 
+from metrics import UPSTREAM_RESPONSES, record_stage, timed
+from upstream import override_origin
+
 UA = {"User-Agent": "Mozilla/5.0 (Tipsbot)"}
 
 def _to_float(s: Optional[str]) -> Optional[float]:
@@ -60,10 +63,23 @@ def fetch_footy(url: str) -> Dict[str, Any]:
     - H2H senaste 5 (t.ex. 'H:2 X:1 B:2' och sträng)
     Returnerar som dict -> excel_utils skriver till filen.
     """
-    r = requests.get(url, headers=UA, timeout=25)
+    try:
+        with timed("footy.download"):
+            r = requests.get(override_origin(url, "FOOTY_ORIGIN"), headers=UA, timeout=25)
+    except requests.RequestException:
+        UPSTREAM_RESPONSES.inc(source="footy", status="error")
+        raise
+    UPSTREAM_RESPONSES.inc(source="footy", status=str(r.status_code))
+    # DNS/TLS/connect + väntan på svarshuvuden; download ovan är hela hämtningen
+    record_stage("footy.ttfb", r.elapsed.total_seconds())
     r.raise_for_status()
-    soup = BeautifulSoup(r.text, "html.parser")
+    with timed("footy.parse"):
+        soup = BeautifulSoup(r.text, "html.parser")
+
+    with timed("footy.extract"):
+        return _extract_footy(soup, url)
 
+def _extract_footy(soup: BeautifulSoup, url: str) -> Dict[str, Any]:
     text = " ".join(soup.stripped_strings)
 
     # Lag-namn (rubrik överst brukar ha "Team A vs Team B")
@@ -79,12 +95,16 @@ def fetch_footy(url: str) -> Dict[str, Any]:
 
     # Form (senaste 5) – ofta visas med W/D/L-bokstäver nära teamkort
     def find_form_for(label: str) -> Optional[str]:
-        # Försök hitta sektion med "Form" nära lagets namn
-        patt = re.compile(rf"{re.escape(label)}.*?Form[^WDL]*(W|D|L){{3,6}}", re.I | re.S)
-        mm = patt.search(text)
-        if mm:
-            seq = re.search(r"(W|D|L){3,6}", mm.group(0))
-            if seq: return seq.group(0)
+        # Närmaste "Form" efter någon förekomst av lagets namn – annars landar
+        # bortalagets sökning via rubriken "A vs B" på hemmalagets form
+        form_re = re.compile(r"Form[^WDLwdl]{0,40}?((?:W|D|L){3,6})", re.I)
+        best: Optional[Tuple[int, str]] = None
+        for lm in re.finditer(re.escape(label), text, re.I):
+            fm = form_re.search(text, lm.end())
+            if fm and (best is None or fm.start() - lm.end() < best[0]):
+                best = (fm.start() - lm.end(), fm.group(1).upper())
+        if best:
+            return best[1]
         # fallback: första sekvensen W/D/L på sidan
         seq = re.search(r"(W|D|L){3,6}", text)
         return seq.group(0) if seq else None
@@ -1,10 +1,16 @@
 import re
 import os
 import pathlib
+from typing import Dict, List, Tuple
 from urllib.parse import urlparse, urlunparse
 import requests
 from bs4 import BeautifulSoup
 
+from metrics import UPSTREAM_RESPONSES, profile, record_stage, timed
+from models import MatchRow
+from snapshots import SNAPSHOTS
+from upstream import override_origin
+
 UA = ("Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
       "AppleWebKit/537.36 (KHTML, like Gecko) "
       "Chrome/126.0 Safari/537.36")
@@ -12,8 +18,6 @@ UA = ("Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
 STATIC_DIR = pathlib.Path(__file__).parent / "static"
 STATIC_DIR.mkdir(exist_ok=True)
 
-DEBUG_HTML_PATH = STATIC_DIR / "stryket_debug.html"
-
 def _normalize_url(url: str) -> str:
     """
     Se till att vi alltid landar på https://www.stryketanalysen.se/stryktipset/
@@ -36,20 +40,28 @@ def _normalize_url(url: str) -> str:
         u += "/"
     return u
 
-def _get(url: str) -> str:
-    r = requests.get(
-        url,
-        headers={
-            "User-Agent": UA,
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-            "Accept-Language": "sv-SE,sv;q=0.9,en-US;q=0.8,en;q=0.7",
-            "Cache-Control": "no-cache",
-            "Pragma": "no-cache",
-        },
-        timeout=20,
-    )
+def _get(url: str) -> Tuple[str, int]:
+    try:
+        with timed("stryket.download"):
+            r = requests.get(
+                override_origin(url, "STRYKET_ORIGIN"),
+                headers={
+                    "User-Agent": UA,
+                    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+                    "Accept-Language": "sv-SE,sv;q=0.9,en-US;q=0.8,en;q=0.7",
+                    "Cache-Control": "no-cache",
+                    "Pragma": "no-cache",
+                },
+                timeout=20,
+            )
+    except requests.RequestException:
+        UPSTREAM_RESPONSES.inc(source="stryket", status="error")
+        raise
+    UPSTREAM_RESPONSES.inc(source="stryket", status=str(r.status_code))
+    # DNS/TLS/connect + väntan på svarshuvuden; download ovan är hela hämtningen
+    record_stage("stryket.ttfb", r.elapsed.total_seconds())
     r.raise_for_status()
-    return r.text
+    return r.text, r.status_code
 
 def _parse_percent(cell_text: str) -> int:
     # ex: "26%" -> 26
@@ -64,7 +76,7 @@ def _parse_float(txt: str) -> float:
     except:
         return 0.0
 
-def _extract_matches(soup: BeautifulSoup):
+def _extract_matches(soup: BeautifulSoup) -> List[MatchRow]:
     """
     Försöker flera vägar för att hitta 13 matchrader:
     - 'div' som ser ut som kort/rad för en match
@@ -72,7 +84,8 @@ def _extract_matches(soup: BeautifulSoup):
       samt lag/nummer längst till vänster.
     OBS: Klassnamn kan ändras – därför matchar vi semantiskt.
     """
-    candidates = []
+    # senaste träff per matchnr vinner (deduplikation direkt, ingen mellanlista)
+    uniq: Dict[int, MatchRow] = {}
 
     # 1) Sektion "Veckans kupong" – ofta ett wrapper-kort med många rader
     main_sections = soup.select("div#content, main, div.container, section")
@@ -138,49 +151,50 @@ def _extract_matches(soup: BeautifulSoup):
 
         # rimlig rad?
         if mnr and home and away and odds and folk:
-            entry = {
-                "matchnr": mnr,
-                "hemmalag": home,
-                "bortalag": away,
-                "odds_1": odds[0],
-                "odds_x": odds[1],
-                "odds_2": odds[2],
-                "folk_1": folk[0],
-                "folk_x": folk[1],
-                "folk_2": folk[2],
-            }
-            if spelv:
-                entry.update({
-                    "spelv_1": spelv[0],
-                    "spelv_x": spelv[1],
-                    "spelv_2": spelv[2],
-                })
-            candidates.append(entry)
-
-    # deduplikation & sortering på matchnr
-    uniq = {}
-    for c in candidates:
-        uniq[c["matchnr"]] = c
-    out = [uniq[k] for k in sorted(uniq.keys())]
-    return out
+            uniq[mnr] = MatchRow(
+                matchnr=mnr,
+                hemmalag=home,
+                bortalag=away,
+                odds_1=odds[0],
+                odds_x=odds[1],
+                odds_2=odds[2],
+                folk_1=folk[0],
+                folk_x=folk[1],
+                folk_2=folk[2],
+                spelv_1=spelv[0] if spelv else None,
+                spelv_x=spelv[1] if spelv else None,
+                spelv_2=spelv[2] if spelv else None,
+            )
+
+    # sortering på matchnr
+    return [uniq[k] for k in sorted(uniq.keys())]
 
 def fetch_stryket(url: str, debug: bool = False):
     """
-    Returnerar dict {"svenskaspel": [13 poster]} eller höjer Exception.
-    Sparar alltid debug-HTML om debug=True eller om 0 rader hittas.
+    Returnerar dict {"svenskaspel": [13 MatchRow]} eller höjer Exception.
+    Sparar en debug-snapshot (i bakgrunden) om debug=True, vid HTTP-fel eller om 0 rader hittas.
     """
     norm = _normalize_url(url)
-    html = _get(norm)
-    soup = BeautifulSoup(html, "html.parser")
-
-    rows = _extract_matches(soup)
-
-    # spara debug-HTML om vi misslyckas eller om debug begärts
-    if debug or not rows:
+    with profile() as timings:
         try:
-            DEBUG_HTML_PATH.write_text(html, encoding="utf-8")
-        except Exception:
-            pass
+            html, status = _get(norm)
+        except requests.RequestException as e:
+            # spara även HTTP-fel/timeouts – det är de fallen man oftast vill felsöka
+            resp = getattr(e, "response", None)
+            SNAPSHOTS.capture("stryket", norm, resp.text if resp is not None else "",
+                              status=resp.status_code if resp is not None else None,
+                              rows=0, timings=timings, error=f"{type(e).__name__}: {e}")
+            raise
+        with timed("stryket.parse"):
+            soup = BeautifulSoup(html, "html.parser")
+
+        with timed("stryket.extract"):
+            rows = _extract_matches(soup)
+
+    # spara snapshot om vi misslyckas eller om debug begärts (skrivs av bakgrundstråden)
+    if debug or not rows:
+        SNAPSHOTS.capture("stryket", norm, html, status=status, rows=len(rows), timings=timings,
+                          error=None if rows else "Inga matcher hittades")
 
     if not rows:
         raise RuntimeError("Scrape-fel: Inga matcher hittades på stryketanalysen-sidan.")
@@ -5,6 +5,10 @@ from typing import Dict, Any, Tuple, Optional, List
 import asyncio, os, re
 from playwright.async_api import async_playwright
 
+from metrics import BROWSER_LAUNCHES, BROWSERS_ACTIVE, UPSTREAM_RESPONSES, profile, timed
+from models import MatchRow
+from snapshots import SNAPSHOTS
+
 PW_CACHE = "/opt/render/.cache/ms-playwright"
 os.environ.setdefault("PLAYWRIGHT_BROWSERS_PATH", PW_CACHE)
 
@@ -36,56 +40,67 @@ async def _ensure_chromium() -> None:
         )
         await proc.communicate()
 
-async def _open_and_get_html(url: str, debug: bool) -> Tuple[str, Optional[int]]:
-    """Öppnar sidan och returnerar (html, status). Höga timeouts + networkidle."""
+async def _open_and_get_html(url: str, debug: bool) -> Tuple[str, Optional[int], Optional[bytes]]:
+    """Öppnar sidan och returnerar (html, status, screenshot). Höga timeouts + networkidle."""
     async with async_playwright() as p:
-        browser = await p.chromium.launch(
-            headless=True,
-            args=["--no-sandbox", "--disable-dev-shm-usage", "--disable-gpu",
-                  "--disable-blink-features=AutomationControlled"]
-        )
-        ctx = await browser.new_context(
-            user_agent=UA, locale="sv-SE", timezone_id="Europe/Stockholm",
-            viewport={"width": 1366, "height": 850},
-            extra_http_headers={
-                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-                "Accept-Language": "sv-SE,sv;q=0.9,en-US;q=0.8,en;q=0.7",
-                "Upgrade-Insecure-Requests": "1",
-            },
-        )
-        await ctx.add_init_script(_anti_detect_js())
-        page = await ctx.new_page()
-        page.set_default_timeout(60_000)  # 60 sek
-
-        resp = await page.goto(str(url), wait_until="domcontentloaded", timeout=60_000)
-        # ge nätverket chans att bli idle
+        with timed("svspel.browser_launch"):
+            browser = await p.chromium.launch(
+                headless=True,
+                args=["--no-sandbox", "--disable-dev-shm-usage", "--disable-gpu",
+                      "--disable-blink-features=AutomationControlled"]
+            )
+        BROWSER_LAUNCHES.inc()
+        BROWSERS_ACTIVE.inc()
         try:
-            await page.wait_for_load_state("networkidle", timeout=20_000)
-        except Exception:
-            pass
-
-        html = await page.content()
-        status = None
-        try:
-            if resp:
-                status = resp.status
-        except Exception:
+            ctx = await browser.new_context(
+                user_agent=UA, locale="sv-SE", timezone_id="Europe/Stockholm",
+                viewport={"width": 1366, "height": 850},
+                extra_http_headers={
+                    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+                    "Accept-Language": "sv-SE,sv;q=0.9,en-US;q=0.8,en;q=0.7",
+                    "Upgrade-Insecure-Requests": "1",
+                },
+            )
+            await ctx.add_init_script(_anti_detect_js())
+            page = await ctx.new_page()
+            page.set_default_timeout(60_000)  # 60 sek
+
+            with timed("svspel.goto"):
+                resp = await page.goto(str(url), wait_until="domcontentloaded", timeout=60_000)
+            # ge nätverket chans att bli idle
+            with timed("svspel.networkidle"):
+                try:
+                    await page.wait_for_load_state("networkidle", timeout=20_000)
+                except Exception:
+                    pass
+
+            with timed("svspel.content"):
+                html = await page.content()
             status = None
-
-        if debug:
             try:
-                await page.screenshot(path="/tmp/svs_debug.png", full_page=True)
-                with open("/tmp/svs_debug.html", "w", encoding="utf-8") as f:
-                    f.write(html)
+                if resp:
+                    status = resp.status
             except Exception:
-                pass
-
-        await ctx.close(); await browser.close()
-        return html, status
-
-def _parse(html: str) -> List[Dict[str, Any]]:
+                status = None
+            UPSTREAM_RESPONSES.inc(source="svspel", status=str(status) if status else "unknown")
+
+            # skärmdump tas i minnet – själva skrivningen sköts av snapshots i bakgrunden
+            shot = None
+            if debug:
+                try:
+                    with timed("svspel.screenshot"):
+                        shot = await page.screenshot(full_page=True)
+                except Exception:
+                    shot = None
+
+            await ctx.close(); await browser.close()
+            return html, status, shot
+        finally:
+            BROWSERS_ACTIVE.dec()
+
+def _parse(html: str) -> List[MatchRow]:
     """Tolerant parser för matchnr, lag och odds."""
-    rows: List[Dict[str, Any]] = []
+    rows: List[MatchRow] = []
 
     # Försök 1: CSS-liknande mönster
     # (behåller regex för att överleva DOM-ändringar)
@@ -103,12 +118,11 @@ def _parse(html: str) -> List[Dict[str, Any]]:
         h, a = titles[i][0].strip(), titles[i][1].strip()
         o1, ox, o2 = (x.replace(",", ".") for x in odds[i])
         try:
-            rows.append({
-                "matchnr": i + 1,
-                "hemmalag": h, "bortalag": a,
-                "odds_1": float(o1), "odds_x": float(ox), "odds_2": float(o2),
-                "folk_1": None, "folk_x": None, "folk_2": None,
-            })
+            rows.append(MatchRow(
+                matchnr=i + 1,
+                hemmalag=h, bortalag=a,
+                odds_1=float(o1), odds_x=float(ox), odds_2=float(o2),
+            ))
         except Exception:
             continue
 
@@ -116,10 +130,11 @@ def _parse(html: str) -> List[Dict[str, Any]]:
 
 async def fetch_kupong(url: str, debug: bool = False) -> Dict[str, Any]:
     """
-    Lyckat:  { "results": [ {...}, ... ] }
+    Lyckat:  { "results": [ MatchRow, ... ] }
     Fel:     { "error": "text" }
     """
-    await _ensure_chromium()
+    with timed("svspel.ensure_chromium"):
+        await _ensure_chromium()
 
     backoffs = [5, 8, 12]  # sekunder
     last_err = None
@@ -127,16 +142,25 @@ async def fetch_kupong(url: str, debug: bool = False) -> Dict[str, Any]:
 
     for i, pause in enumerate(backoffs, start=1):
         try:
-            html, status = await _open_and_get_html(url, debug)
+            with profile() as timings:
+                html, status, shot = await _open_and_get_html(url, debug)
             last_status = status
 
             low = html.lower()
             if ("cloudflare" in low or "captcha" in low or "access denied" in low) or (status and status >= 500):
                 last_err = f"Blockerad/5xx (försök {i})."
+                SNAPSHOTS.capture("svspel", str(url), html, status=status, rows=0, timings=timings,
+                                  error=last_err, screenshot=shot)
                 await asyncio.sleep(pause)
                 continue
 
-            rows = _parse(html)
+            with profile() as parse_timings:
+                with timed("svspel.parse"):
+                    rows = _parse(html)
+            if debug or not rows:
+                SNAPSHOTS.capture("svspel", str(url), html, status=status, rows=len(rows),
+                                  timings=timings + parse_timings, screenshot=shot,
+                                  error=None if rows else "Inga matcher hittades")
             if not rows:
                 last_err = "Inga matcher hittades på sidan."
                 await asyncio.sleep(pause if i < len(backoffs) else 0)
@@ -0,0 +1,210 @@
+# snapshots.py – debug-snapshots av hämtade sidor utanför request-flödet
+# - capture() lägger bara jobbet i en kö; en bakgrundstråd gzippar och skriver
+# - ringbuffert: de senaste SNAPSHOT_MAX sparas, äldsta tas bort
+# - varje snapshot har metadata (URL, status, antal rader, stegtider, ...)
+
+from __future__ import annotations
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import gzip
+import json
+import os
+import pathlib
+import queue
+import re
+import threading
+import time
+
+from metrics import SNAPSHOT_WRITES
+
+SNAPSHOT_DIR = pathlib.Path(os.environ.get("SNAPSHOT_DIR", pathlib.Path(__file__).parent / "snapshots"))
+SNAPSHOT_MAX = int(os.environ.get("SNAPSHOT_MAX", "20"))
+
+# filnamn som SnapshotStore själv skapar: "<ms>-<seq>.html.gz" / ".json" / ".png"
+_OWN_ID = re.compile(r"(\d+)-(\d+)")
+_OWN_FILE = re.compile(r"(\d+-\d+)\.(?:html\.gz|json|png)")
+CLEAR_TIMEOUT_S = 5.0
+
+def _id_key(sid: Any) -> Optional[Tuple[int, int]]:
+    """(ms, seq) för ett giltigt snapshot-id, annars None."""
+    m = _OWN_ID.fullmatch(sid) if isinstance(sid, str) else None
+    return (int(m.group(1)), int(m.group(2))) if m else None
+
+class SnapshotStore:
+    def __init__(self, directory: pathlib.Path, max_items: int, queue_size: int = 32):
+        self.directory = directory
+        self.max_items = max_items
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=queue_size)
+        self._index: Deque[Dict[str, Any]] = deque()   # äldst först
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._last_key: Tuple[int, int] = (0, 0)     # senast utdelade id
+        self._cleared_upto: Tuple[int, int] = (0, 0) # id:n <= detta är rensade
+        self._thread: Optional[threading.Thread] = None
+        self._load_index()
+
+    # ---- anropas från request-tråden (ska vara billigt) ----
+    def capture(self, source: str, url: str, html: str, *, status: Optional[int] = None,
+                rows: Optional[int] = None, timings: Optional[List[Dict[str, float]]] = None,
+                error: Optional[str] = None, screenshot: Optional[bytes] = None) -> Optional[str]:
+        """Köa en snapshot. Returnerar dess id, eller None om kön är full."""
+        with self._lock:
+            self._seq += 1
+            self._last_key = (int(time.time() * 1000), self._seq)
+            sid = f"{self._last_key[0]}-{self._last_key[1]}"
+        meta = {
+            "id": sid,
+            "source": source,
+            "url": url,
+            "status": status,
+            "rows": rows,
+            "error": error,
+            "timings": timings or [],
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "has_screenshot": screenshot is not None,
+        }
+        try:
+            self._queue.put_nowait({"op": "write", "meta": meta, "html": html, "screenshot": screenshot})
+        except queue.Full:
+            SNAPSHOT_WRITES.inc(result="dropped")
+            return None
+        self._ensure_thread()
+        return sid
+
+    def clear(self) -> None:
+        """Töm listan direkt; filerna tas bort i bakgrunden (eller här om kön är full)."""
+        with self._lock:
+            self._index.clear()
+            self._cleared_upto = self._last_key
+            upto = self._cleared_upto
+        try:
+            self._queue.put({"op": "clear", "upto": upto}, timeout=CLEAR_TIMEOUT_S)
+        except queue.Full:
+            # skrivtråden hänger efter – släpp inte rensningen, gör den själv
+            self._clear(upto)
+            return
+        self._ensure_thread()
+
+    # ---- läsning ----
+    def list(self) -> List[Dict[str, Any]]:
+        """Metadata för sparade snapshots, nyast först."""
+        with self._lock:
+            return list(reversed(self._index))
+
+    def get(self, sid: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return next((m for m in self._index if m["id"] == sid), None)
+
+    def latest(self, source: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return next((m for m in reversed(self._index) if source is None or m["source"] == source), None)
+
+    def html_path(self, sid: str) -> pathlib.Path:
+        return self.directory / f"{sid}.html.gz"
+
+    def screenshot_path(self, sid: str) -> pathlib.Path:
+        return self.directory / f"{sid}.png"
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Vänta tills kön är tom (för tester/benchmark)."""
+        deadline = time.time() + timeout
+        while self._queue.unfinished_tasks and time.time() < deadline:
+            time.sleep(0.01)
+
+    # ---- bakgrundstråd ----
+    def _ensure_thread(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="snapshot-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            try:
+                if job["op"] == "clear":
+                    self._clear(job["upto"])
+                else:
+                    self._write(job)
+            except Exception:
+                SNAPSHOT_WRITES.inc(result="failed")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, job: Dict[str, Any]) -> None:
+        meta = job["meta"]
+        sid = meta["id"]
+        if self._is_cleared(sid):
+            return   # köades före en /reset
+        self.directory.mkdir(parents=True, exist_ok=True)
+        raw = job["html"].encode("utf-8")
+        self.html_path(sid).write_bytes(gzip.compress(raw, compresslevel=6))
+        if job["screenshot"] is not None:
+            self.screenshot_path(sid).write_bytes(job["screenshot"])
+        meta["size"] = len(raw)
+        meta["gz_size"] = self.html_path(sid).stat().st_size
+        (self.directory / f"{sid}.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        SNAPSHOT_WRITES.inc(result="written")
+
+        with self._lock:
+            if _id_key(sid) <= self._cleared_upto:
+                evicted = [meta]   # /reset kom medan vi skrev
+            else:
+                self._index.append(meta)
+                evicted = []
+            while len(self._index) > self.max_items:
+                evicted.append(self._index.popleft())
+        for old in evicted:
+            self._remove_files(old["id"])
+
+    def _is_cleared(self, sid: str) -> bool:
+        with self._lock:
+            return _id_key(sid) <= self._cleared_upto
+
+    def _clear(self, upto: Tuple[int, int]) -> None:
+        # ta bara bort våra egna filer (SNAPSHOT_DIR kan peka på en delad katalog),
+        # och bara de som fanns vid /reset – nyare snapshots får ligga kvar
+        if not self.directory.is_dir():
+            return
+        for p in self.directory.iterdir():
+            m = _OWN_FILE.fullmatch(p.name)
+            if m and _id_key(m.group(1)) <= upto:
+                p.unlink(missing_ok=True)
+
+    def _remove_files(self, sid: str) -> None:
+        for p in (self.html_path(sid), self.screenshot_path(sid), self.directory / f"{sid}.json"):
+            try:
+                p.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _load_index(self) -> None:
+        # plocka upp snapshots från förra körningen (om katalogen finns kvar)
+        if not self.directory.is_dir():
+            return
+        # bara våra egna filer – katalogen kan innehålla annat (package.json m.m.)
+        metas = []
+        for p in self.directory.glob("*.json"):
+            own = _OWN_FILE.fullmatch(p.name)
+            if not own:
+                continue
+            try:
+                meta = json.loads(p.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            if not isinstance(meta, dict) or meta.get("id") != own.group(1):
+                continue
+            metas.append(meta)
+        metas.sort(key=lambda m: _id_key(m["id"]))
+        keep = metas[-self.max_items:]
+        for m in metas[:len(metas) - len(keep)]:
+            self._remove_files(m["id"])
+        self._index.extend(keep)
+        if keep:
+            # /reset ska även ta förra körningens snapshots
+            self._last_key = max(self._last_key, _id_key(keep[-1]["id"]))
+
+SNAPSHOTS = SnapshotStore(SNAPSHOT_DIR, SNAPSHOT_MAX)
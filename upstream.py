@@ -0,0 +1,13 @@
+# upstream.py – styr om externa anrop till lokala stand-ins (lasttest/offline)
+# Sätt t.ex. STRYKET_ORIGIN=http://127.0.0.1:8001 så hämtas sidan därifrån
+# i stället för från stryketanalysen.se. Utan env-variabel är allt som vanligt.
+
+import os
+from urllib.parse import urlparse, urlunparse
+
+def override_origin(url: str, env: str) -> str:
+    origin = os.environ.get(env)
+    if not origin:
+        return url
+    o = urlparse(origin)
+    return urlunparse(urlparse(url)._replace(scheme=o.scheme, netloc=o.netloc))